@@ -1,7 +1,6 @@
-import io
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 from third_party_clients.pan.pan_config import (
     EXTERNAL_BLOCK_TAG,
     INTERNAL_BLOCK_TAG,
@@ -16,31 +15,83 @@ from third_party_clients.third_party_interface import (
     VectraStaticIP,
 )
 
-from vectra_automated_response import _get_password
+from vectra_automated_response import _get_password, _get_session
 
 
 class Client(ThirdPartyInterface):
     def __init__(self, **kwargs):
         self.name = "PAN Client"
         self.logger = logging.getLogger()
-        self.firewalls = []
-        for url in URLS:
-            self.firewalls.append(
-                {
-                    "url": url,
-                    "api_key": _get_password("PAN", "API_Key", modify=kwargs["modify"]),
-                }
-            )
+        # All firewalls share the one stored API key, so it is only looked up once
+        api_key = _get_password("PAN", "API_Key", modify=kwargs["modify"])
+        # The User-ID endpoint and auth header never change, so build them up front
+        self.firewalls = [
+            {
+                "url": url,
+                "api_key": api_key,
+                "uid_url": "{}/api/?type=user-id&action=set".format(url),
+                "headers": {"X-PAN-KEY": api_key},
+            }
+            for url in URLS
+        ]
         self.verify = VERIFY_SSL
+        # Keep-alive pool so repeated calls to a firewall reuse the TLS session
+        self.session = _get_session()
+        # Firewalls are independent, so calls to each of them are issued in parallel.
+        # The executor is created on first use, as it cannot be pickled into the
+        # per-brain processes.
+        self._pool = None
         self.internal_block_tag = INTERNAL_BLOCK_TAG
         self.external_block_tag = EXTERNAL_BLOCK_TAG
+        # Per-tag <entry> templates, leaving only the IP to substitute per address
+        self._entry_templates = {
+            tag: self._entry_template(tag)
+            for tag in (self.internal_block_tag, self.external_block_tag)
+        }
         # Instantiate parent class
         ThirdPartyInterface.__init__(self)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+
+    def close(self):
+        """
+        Stop the worker threads used to reach the firewalls
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __del__(self):
+        if getattr(self, "_pool", None) is not None:
+            self._pool.shutdown(wait=False)
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=max(4, len(self.firewalls)))
+        return self._pool
+
+    def _on_all_firewalls(self, action, ip_addresses, tag):
+        """
+        Run a register/unregister action against every firewall concurrently
+        :param action: bound method taking (firewall, ip_addresses, tag)
+        :param ip_addresses: list of IP addresses to pass to the action
+        :param tag: the PAN tag to pass to the action
+        :rtype: list of the action results, one per firewall
+        """
+        return list(
+            self._get_pool().map(
+                lambda firewall: action(firewall, ip_addresses, tag), self.firewalls
+            )
+        )
+
     def block_host(self, host):
         ip_address = host.ip
-        for firewall in self.firewalls:
-            self.register_address(firewall, [ip_address], self.internal_block_tag)
+        self._on_all_firewalls(
+            self.register_address, [ip_address], self.internal_block_tag
+        )
         return [ip_address]
 
     def block_account(self, account: VectraAccount) -> list:
@@ -51,8 +102,9 @@ class Client(ThirdPartyInterface):
         ip_addresses = host.blocked_elements.get(self.__class__.__name__, [])
         if len(ip_addresses) < 1:
             self.logger.error("No IP address found for host {}".format(host.name))
-        for firewall in self.firewalls:
-            self.unregister_address(firewall, ip_addresses, self.internal_block_tag)
+        self._on_all_firewalls(
+            self.unregister_address, ip_addresses, self.internal_block_tag
+        )
         return ip_addresses
 
     def unblock_account(self, account: VectraAccount) -> list:
@@ -65,8 +117,9 @@ class Client(ThirdPartyInterface):
 
     def block_detection(self, detection):
         ip_addresses = detection.dst_ips
-        for firewall in self.firewalls:
-            self.register_address(firewall, ip_addresses, self.external_block_tag)
+        self._on_all_firewalls(
+            self.register_address, ip_addresses, self.external_block_tag
+        )
         return ip_addresses
 
     def unblock_detection(self, detection):
@@ -75,8 +128,9 @@ class Client(ThirdPartyInterface):
             self.logger.error(
                 "No IP address found for Detection ID {}".format(detection.id)
             )
-        for firewall in self.firewalls:
-            self.unregister_address(firewall, ip_addresses, self.external_block_tag)
+        self._on_all_firewalls(
+            self.unregister_address, ip_addresses, self.external_block_tag
+        )
         return ip_addresses
 
     def block_static_dst_ips(self, ips: VectraStaticIP) -> list:
@@ -84,8 +138,9 @@ class Client(ThirdPartyInterface):
         self.logger.info(
             "Received static IPs: {} for PAN to block".format(ip_addresses)
         )
-        for firewall in self.firewalls:
-            self.register_address(firewall, ip_addresses, self.external_block_tag)
+        self._on_all_firewalls(
+            self.register_address, ip_addresses, self.external_block_tag
+        )
         return ip_addresses
 
     def unblock_static_dst_ips(self, ips: VectraStaticIP) -> list:
@@ -93,35 +148,57 @@ class Client(ThirdPartyInterface):
         self.logger.info("Received IPs: {} for PAN to unblock".format(ip_addresses))
         if len(ip_addresses) < 1:
             self.logger.error("No IP addresses supplied for static destination unblock")
-        for firewall in self.firewalls:
-            self.unregister_address(firewall, ip_addresses, self.external_block_tag)
+        self._on_all_firewalls(
+            self.unregister_address, ip_addresses, self.external_block_tag
+        )
         return ip_addresses
 
+    @staticmethod
+    def _entry_template(tag):
+        """
+        Build a %-style template for a User-ID entry carrying the given tag
+        :param tag: the PAN tag to bake into the template
+        :rtype: str
+        """
+        return (
+            '<entry ip="%s"><tag><member>'
+            + tag.replace("%", "%%")
+            + "</member></tag></entry>"
+        )
+
+    def _build_uid_message(self, operation, ip_addresses, tag):
+        """
+        Build a User-ID API message tagging/untagging IP addresses
+        :param operation: 'register' or 'unregister'
+        :param ip_addresses: list of IP addresses to include in the message
+        :param tag: the PAN tag to associate with the addresses
+        :rtype: str
+        """
+        parts = [
+            "<uid-message><version>1.0</version><type>update</type>"
+            f"<payload><{operation}>"
+        ]
+        template = self._entry_templates.get(tag) or self._entry_template(tag)
+        parts.extend(template % ip for ip in ip_addresses)
+        parts.append(f"</{operation}></payload></uid-message>")
+        return "".join(parts)
+
     def register_address(self, firewall, ip_addresses, tag):
         """
         Register IP addresses with firewall based on tag
-        :param firewall: PAN dict {'url': 'https://1.2.3.4', 'api_key'= 'abc1234'}
+        :param firewall: PAN dict {'url': 'https://1.2.3.4', 'api_key'= 'abc1234',
+                         'uid_url': User-ID API URL, 'headers': auth headers}
         :param ip_addresses: list of IP address of the endpoint to quarantine
         :param tag: the PAN tag to register address with
         :rtype: requests.Response
         """
-        payload = io.StringIO(
-            "<uid-message><version>1.0</version><type>update</type><payload><register>"
-            + "".join(
-                [
-                    '<entry ip="{}"><tag><member>{}</member></tag></entry>'.format(
-                        ip, tag
-                    )
-                    for ip in ip_addresses
-                ]
-            )
-            + "</register></payload></uid-message>"
-        )
+        payload = self._build_uid_message("register", ip_addresses, tag).encode()
 
-        r = requests.post(
-            url="{}/api/?type=user-id&action=set".format(firewall["url"]),
-            headers={"X-PAN-KEY": firewall["api_key"]},
+        r = self.session.post(
+            url=firewall["uid_url"],
+            headers=firewall["headers"],
             files={"file": payload},
+            # Passed per call so REQUESTS_CA_BUNDLE/CURL_CA_BUNDLE can't override it
             verify=self.verify,
         )
         if r.ok:
@@ -142,28 +219,19 @@ class Client(ThirdPartyInterface):
     def unregister_address(self, firewall, ip_addresses, tag):
         """
         Unregister IP addresses with firewall based on tag
-        :param firewall: PAN dict {'url': 'https://1.2.3.4', 'api_key'= 'abc1234'}
+        :param firewall: PAN dict {'url': 'https://1.2.3.4', 'api_key'= 'abc1234',
+                         'uid_url': User-ID API URL, 'headers': auth headers}
         :param ip_addresses: list of IP address of the endpoint to quarantine
         :param tag: the PAN tag to register address with
         :rtype: requests.Response
         """
-        payload = io.StringIO(
-            "<uid-message><version>1.0</version><type>update</type><payload><unregister>"
-            + "".join(
-                [
-                    '<entry ip="{}"><tag><member>{}</member></tag></entry>'.format(
-                        ip, tag
-                    )
-                    for ip in ip_addresses
-                ]
-            )
-            + "</unregister></payload></uid-message>"
-        )
+        payload = self._build_uid_message("unregister", ip_addresses, tag).encode()
 
-        r = requests.post(
-            url="{}/api/?type=user-id&action=set".format(firewall["url"]),
-            headers={"X-PAN-KEY": firewall["api_key"]},
+        r = self.session.post(
+            url=firewall["uid_url"],
+            headers=firewall["headers"],
             files={"file": payload},
+            # Passed per call so REQUESTS_CA_BUNDLE/CURL_CA_BUNDLE can't override it
             verify=self.verify,
         )
         if r.ok:
@@ -1,9 +1,8 @@
 import ipaddress
 import logging
-import urllib.parse
-import xml.etree.ElementTree as ET
 
 import requests
+from lxml import etree
 from third_party_clients.sophos.sophos_config import (
     ADDRESS,
     BLOCK_LIST_IPHOST_NAME,
@@ -19,17 +18,30 @@ from third_party_clients.third_party_interface import (
 )
 from urllib3.exceptions import InsecureRequestWarning
 
-from vectra_automated_response import _get_password
+from vectra_automated_response import _get_passwords, _get_session
 
 requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
 
+# Compiled once and evaluated against the <Response> root of each API reply
+LOGIN_STATUS = etree.XPath("string(Login/status)")
+IPHOST_STATUS_CODE = etree.XPath("string(IPHost/Status/@code)")
+IPHOST_STATUS_MSG = etree.XPath("string(IPHost/Status)")
+
 
 class Client(ThirdPartyInterface):
     def __init__(self, **kwargs):
         self.name = "Sophos Client"
         self.logger = logging.getLogger()
-        self.baseurl = f"https://{ADDRESS}:{PORT}/webconsole/APIController?reqxml="
-        self.login_xml = f"<Login><Username>{_get_password("Sophos", "Username", modify=kwargs["modify"])}</Username><Password passwordform=\"{'encrypted' if IS_ENCRYPTED else 'plain'}\">{_get_password("Sophos", "Password", modify=kwargs["modify"])}</Password></Login>"
+        self.session = _get_session()
+        self.verify = False
+        self.baseurl = f"https://{ADDRESS}:{PORT}/webconsole/APIController"
+        username, password = _get_passwords(
+            [("Sophos", "Username"), ("Sophos", "Password")], modify=kwargs["modify"]
+        )
+        password_form = "encrypted" if IS_ENCRYPTED else "plain"
+        self.login_xml = f'<Login><Username>{username}</Username><Password passwordform="{password_form}">{password}</Password></Login>'
+        # Every request must carry the login envelope, so build it only once
+        self._reqxml_prefix = f"<Request>{self.login_xml}"
         self._login_check()
         # Instantiate parent class
         ThirdPartyInterface.__init__(self)
@@ -40,6 +52,24 @@ class Client(ThirdPartyInterface):
     def unblock_host(self, host) -> list[str]:
         return self._unblock_ip(ip=host.ip)
 
+    def bulk_block_hosts(self, hosts: dict[str, VectraHost]) -> dict[str, list]:
+        blocked_ips = set(self._block_ips(ips=[host.ip for host in hosts.values()]))
+        return {
+            host_id: [host.ip]
+            for host_id, host in hosts.items()
+            if host.ip in blocked_ips
+        }
+
+    def bulk_unblock_hosts(self, hosts: dict[str, VectraHost]) -> dict[str, list]:
+        unblocked_ips = set(
+            self._unblock_ips(ips=[host.ip for host in hosts.values()])
+        )
+        return {
+            host_id: [host.ip]
+            for host_id, host in hosts.items()
+            if host.ip in unblocked_ips
+        }
+
     def groom_host(self, host) -> dict:
         self.logger.warning("Sophos client does not implement host grooming")
         return []
@@ -73,19 +103,31 @@ class Client(ThirdPartyInterface):
         # this client only implements Host-based blocking
         return []
 
-    def _make_api_call(self, request_xml: str) -> requests.Response:
-        full_reqxml = f"<Request>{self.login_xml}{request_xml}</Request>"
-        self.logger.debug(f"Making request: {self.baseurl + full_reqxml}")
-        reqxml_encoded = urllib.parse.quote_plus(full_reqxml)
-        url = self.baseurl + reqxml_encoded
-        response = requests.get(url=url, verify=False)
-        response.raise_for_status()
+    def _make_api_call(
+        self, request_xml: str, stream: bool = False
+    ) -> requests.Response:
+        self.logger.debug(f"Making request: {self.baseurl} reqxml={request_xml}")
+        full_reqxml = self._reqxml_prefix + request_xml + "</Request>"
+        # verify is passed per call: a falsy Session.verify would be overridden by
+        # REQUESTS_CA_BUNDLE/CURL_CA_BUNDLE from the environment
+        response = self.session.post(
+            url=self.baseurl,
+            data={"reqxml": full_reqxml},
+            verify=self.verify,
+            stream=stream,
+        )
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            # Release the connection of an unread streamed body back to the pool
+            response.close()
+            raise
         return response
 
     def _login_check(self):
         r = self._make_api_call("")
-        xml = ET.fromstring(r.text)
-        if xml.find("Login").find("status").text == "Authentication Successful":
+        xml = etree.fromstring(r.content)
+        if LOGIN_STATUS(xml) == "Authentication Successful":
             self.logger.info("Sophos Firewall Integration API Login Check Successful")
         else:
             self.logger.error(
@@ -93,34 +135,46 @@ class Client(ThirdPartyInterface):
             )
             exit()
 
-    def _get_blocked_ips(self) -> list[str]:
-        r = self._make_api_call(
-            f'<Get><IPHost><Filter><key name="Name" criteria="=">{BLOCK_LIST_IPHOST_NAME}</key></Filter></IPHost></Get>'
-        )
-        xml = ET.fromstring(r.text)
-        iphosts = xml.findall("IPHost")
-        if len(iphosts) > 1:
+    def _get_blocked_ips(self) -> frozenset[str]:
+        ip_csv = None
+        iphost_count = 0
+        with self._make_api_call(
+            f'<Get><IPHost><Filter><key name="Name" criteria="=">{BLOCK_LIST_IPHOST_NAME}</key></Filter></IPHost></Get>',
+            stream=True,
+        ) as r:
+            r.raw.decode_content = True
+            # Parse incrementally, keeping only the first IPHost's address list
+            for _, elem in etree.iterparse(r.raw, events=("end",), tag="IPHost"):
+                if iphost_count == 0:
+                    ip_csv = elem.findtext("ListOfIPAddresses")
+                iphost_count += 1
+                elem.clear()
+        if iphost_count > 1:
             self.logger.warn(
                 f'Multiple IPHosts with Name equaling "{BLOCK_LIST_IPHOST_NAME}" found. Using first one. Please verify firewall is setup according to documentation.'
             )
-        elif len(iphosts) == 0:
+        elif iphost_count == 0:
             self.logger.error(
                 f'No IPHost with Name equaling "{BLOCK_LIST_IPHOST_NAME}" found. Please verify firewall is setup according to documentation.'
             )
             exit()
-        blocked_ips = iphosts[0].find("ListOfIPAddresses").text.split(sep=",")
+        if ip_csv is None:
+            self.logger.error(
+                f'IPHost "{BLOCK_LIST_IPHOST_NAME}" has no ListOfIPAddresses. Please verify firewall is setup according to documentation.'
+            )
+            exit()
+        blocked_ips = frozenset(ip for ip in ip_csv.split(sep=",") if ip)
         self.logger.debug(f"Retrieved currently blocked ips: {blocked_ips}")
         return blocked_ips
 
-    def _update_blocked_ips(self, ips_to_block: list[str]) -> bool:
-        ip_csv = ",".join(ips_to_block)
+    def _update_blocked_ips(self, ips_to_block: frozenset[str]) -> bool:
+        ip_csv = ",".join(sorted(ips_to_block))
         r = self._make_api_call(
             f'<Set operation="update"><IPHost><Name>{BLOCK_LIST_IPHOST_NAME}</Name><IPFamily>IPv4</IPFamily><HostType>IPList</HostType><ListOfIPAddresses>{ip_csv}</ListOfIPAddresses></IPHost></Set>'
         )
-        xml = ET.fromstring(r.text)
-        status = xml.find("IPHost").find("Status")
-        status_code = status.attrib["code"]
-        status_msg = status.text
+        xml = etree.fromstring(r.content)
+        status_code = IPHOST_STATUS_CODE(xml)
+        status_msg = IPHOST_STATUS_MSG(xml)
         if status_code != "200":
             self.logger.error(
                 f'Error updating IP list of IPHost "{BLOCK_LIST_IPHOST_NAME}". (Status Code: {status_code} - Message: {status_msg})'
@@ -129,24 +183,51 @@ class Client(ThirdPartyInterface):
         return True
 
     def _block_ip(self, ip: str) -> list[str]:
-        if self._validate_ip_address(ip):
-            blocked_ips = self._get_blocked_ips()
-            if ip not in blocked_ips:
-                blocked_ips.append(ip)
-                if self._update_blocked_ips(blocked_ips):
-                    return [ip]
-        return []
+        return self._block_ips([ip])
 
     def _unblock_ip(self, ip: str) -> list[str]:
-        if self._validate_ip_address(ip):
-            blocked_IPs = self._get_blocked_ips()
-            if ip in blocked_IPs:
-                blocked_IPs.remove(ip)
-                if self._update_blocked_ips(blocked_IPs):
-                    return [ip]
+        return self._unblock_ips([ip])
+
+    def _block_ips(self, ips: list[str]) -> list[str]:
+        ips_to_block = [
+            ip for ip in dict.fromkeys(ips) if self._validate_ip_address(ip)
+        ]
+        if not ips_to_block:
+            return []
+        blocked_ips = self._get_blocked_ips()
+        new_ips = [ip for ip in ips_to_block if ip not in blocked_ips]
+        if new_ips and self._update_blocked_ips(blocked_ips.union(new_ips)):
+            return new_ips
+        return []
+
+    def _unblock_ips(self, ips: list[str]) -> list[str]:
+        ips_to_unblock = [
+            ip for ip in dict.fromkeys(ips) if self._validate_ip_address(ip)
+        ]
+        if not ips_to_unblock:
+            return []
+        blocked_ips = self._get_blocked_ips()
+        removed_ips = [ip for ip in ips_to_unblock if ip in blocked_ips]
+        if removed_ips and self._update_blocked_ips(
+            blocked_ips.difference(removed_ips)
+        ):
+            return removed_ips
         return []
 
     def _validate_ip_address(self, ip: str):
+        if not isinstance(ip, str):
+            return False
+        if ":" not in ip:
+            # Dotted-quad check, matching ipaddress' strict IPv4 parsing
+            octets = ip.split(".")
+            return len(octets) == 4 and all(
+                octet.isascii()
+                and octet.isdigit()
+                and len(octet) <= 3
+                and (octet == "0" or octet[0] != "0")
+                and int(octet) <= 255
+                for octet in octets
+            )
         try:
             _ = ipaddress.ip_address(ip)
             return True
@@ -1,5 +1,6 @@
 import abc
 from abc import ABCMeta
+from typing import Optional
 from vectra_automated_response_consts import VectraHost, VectraAccount, VectraDetection, VectraStaticIP
 
 
@@ -97,4 +98,22 @@ class ThirdPartyInterface(metaclass=abc.ABCMeta):
         """
         Unblock VectraStaticIP instance on the corresponding FW/NAC
         :rtype: list of IPs that were blocked
-        """
\ No newline at end of file
+        """
+
+    def bulk_block_hosts(self, hosts: dict) -> Optional[dict]:
+        """
+        Optionally block several VectraHost instances in one go on the corresponding FW/NAC
+        :param hosts: dict of host ID to VectraHost
+        :rtype: dict of host ID to list of elements that were blocked, or None when
+                not implemented, in which case block_host is called per host
+        """
+        return None
+
+    def bulk_unblock_hosts(self, hosts: dict) -> Optional[dict]:
+        """
+        Optionally unblock several VectraHost instances in one go on the corresponding FW/NAC
+        :param hosts: dict of host ID to VectraHost
+        :rtype: dict of host ID to list of elements that were unblocked, or None when
+                not implemented, in which case unblock_host is called per host
+        """
+        return None
@@ -60,7 +60,9 @@ from config import (
     V3,
 )
 from requests import HTTPError
+from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
+from urllib3.util import Retry
 from vectra_automated_response_consts import (
     VectraAccount,
     VectraDetection,
@@ -1261,12 +1263,47 @@ class VectraAutomatedResponse(object):
 
         return ips_to_block, ips_to_unblock
 
+    def _bulk_host_action(self, method_name, hosts):
+        """
+        Runs a bulk host action on every third party client implementing it
+
+        :param method_name: name of the optional bulk method, e.g. "bulk_block_hosts"
+        :param hosts: dict of host ID to VectraHost
+        :return: dict of client to dict of host ID to list of affected elements
+        """
+        results = {}
+        if len(hosts) < 1:
+            return results
+        for third_party_client in self.third_party_clients:
+            # Clients not deriving from ThirdPartyInterface may lack the hook entirely
+            bulk_method = getattr(third_party_client, method_name, None)
+            if bulk_method is None:
+                continue
+            try:
+                bulk_results = bulk_method(hosts)
+                if bulk_results is not None:
+                    results[third_party_client] = bulk_results
+            except (HTTPException, requests.exceptions.RequestException) as e:
+                # Fall back to per-host calls for this client
+                self.logger.warning(
+                    "Bulk action {} failed on client {}: {}".format(
+                        method_name, third_party_client.name, str(e)
+                    )
+                )
+        return results
+
     def block_hosts(self, hosts_to_block):
+        bulk_blocked = self._bulk_host_action("bulk_block_hosts", hosts_to_block)
         for host_id, host in hosts_to_block.items():
             for third_party_client in self.third_party_clients:
                 try:
                     # Block endpoint
-                    blocked_elements = third_party_client.block_host(host=host)
+                    if third_party_client in bulk_blocked:
+                        blocked_elements = bulk_blocked[third_party_client].get(
+                            host_id, []
+                        )
+                    else:
+                        blocked_elements = third_party_client.block_host(host=host)
                     if len(blocked_elements) > 0:
                         message = "Blocked host {id} on client {client}".format(
                             id=host_id, client=third_party_client.name
@@ -1310,6 +1347,14 @@ class VectraAutomatedResponse(object):
                     self.err_msg.append(message)
 
     def unblock_hosts(self, hosts_to_unblock):
+        bulk_unblocked = self._bulk_host_action(
+            "bulk_unblock_hosts",
+            {
+                host_id: host
+                for host_id, host in hosts_to_unblock.items()
+                if len(host.blocked_elements) > 0
+            },
+        )
         for host_id, host in hosts_to_unblock.items():
             blocked_elements = host.blocked_elements
             if len(blocked_elements) < 1:
@@ -1319,7 +1364,12 @@ class VectraAutomatedResponse(object):
                 continue
             for third_party_client in self.third_party_clients:
                 try:
-                    unblocked_elements = third_party_client.unblock_host(host)
+                    if third_party_client in bulk_unblocked:
+                        unblocked_elements = bulk_unblocked[third_party_client].get(
+                            host_id, []
+                        )
+                    else:
+                        unblocked_elements = third_party_client.unblock_host(host)
                     if len(unblocked_elements) > 0:
                         for element in unblocked_elements:
                             blocked_elements[third_party_client.name].remove(element)
@@ -1745,20 +1795,86 @@ def generate_messages(messages, **kwargs):
             i += 1
 
 
-def _get_password(system, key, **kwargs):
+# Connection pool shared by third party client sessions, so sockets to the same
+# host are reused across clients. The POSTs sent through it are idempotent
+# updates, so they are retried on transient server errors as well.
+_http_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+        raise_on_status=False,
+    ),
+)
+
+
+# Connections opened in the parent (e.g. client login checks) must not be shared
+# by the per-brain processes forked from it, so each child starts with empty pools
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_http_adapter.poolmanager.clear)
+
+
+def _get_session():
+    session = requests.Session()
+    session.mount("https://", _http_adapter)
+    return session
+
+
+# Credentials already retrieved during this run, keyed by (system, key)
+_password_cache = {}
+
+
+def _get_passwords(items, **kwargs):
+    """
+    Retrieves several credentials, prompting for all missing ones in a single form
+
+    :param items: list of (system, key) tuples to retrieve
+    :return: list of passwords, in the same order as items
+    """
     store_keys = kwargs["modify"][0]
     update_keys = kwargs["modify"][1]
-    password = keyring.get_password(system, key)
-    if update_keys or password is None:
-        password = questionary.password(f"Enter the {system} {key}: ").ask()
-    if store_keys:
+    passwords = {}
+    missing = []
+    for system, key in dict.fromkeys(items):
+        if (system, key) in _password_cache:
+            passwords[(system, key)] = _password_cache[(system, key)]
+            continue
+        password = None if update_keys else keyring.get_password(system, key)
+        if password is None:
+            missing.append((system, key))
+        else:
+            passwords[(system, key)] = password
+    if missing:
+        # Index-based field names, as system and key may contain any characters
+        answers = (
+            questionary.form(
+                **{
+                    f"q{i}": questionary.password(f"Enter the {system} {key}: ")
+                    for i, (system, key) in enumerate(missing)
+                }
+            ).ask()
+            or {}
+        )
+        for i, (system, key) in enumerate(missing):
+            password = answers.get(f"q{i}")
+            passwords[(system, key)] = password
+            if store_keys and password is not None:
+                try:
+                    keyring.set_password(system, key, password)
+                except keyring.errors.PasswordSetError:
+                    print("Failed to store password")
+    for item, password in passwords.items():
         if password is not None:
-            try:
-                keyring.set_password(system, key, password)
-            except keyring.errors.PasswordSetError:
-                print("Failed to store password")
+            _password_cache[item] = password
 
-    return password
+    return [passwords[item] for item in items]
+
+
+def _get_password(system, key, **kwargs):
+    return _get_passwords([(system, key)], **kwargs)[0]
 
 
 def main(args, vectra_api_client, third_party_clients):
@@ -2010,6 +2126,21 @@ if __name__ == "__main__":
         store = True
 
     modify = (store, args.update_secrets)
+    # Collect every brain's credentials first so missing ones are asked in one form
+    credential_keys = {
+        url: (
+            ["Client_ID", "Secret_Key"]
+            if re.match(URL_REGEX, url, re.IGNORECASE)
+            else ["Token"]
+        )
+        for url in COGNITO_URL
+    }
+    credential_items = [
+        (url, key) for url, keys in credential_keys.items() for key in keys
+    ]
+    credentials = dict(
+        zip(credential_items, _get_passwords(credential_items, modify=modify))
+    )
     vectra_api_clients = []
     for url in COGNITO_URL:
         logger.debug(f"Configuring Vectra API Client for {url}")
@@ -2017,15 +2148,15 @@ if __name__ == "__main__":
             vectra_api_clients.append(
                 VectraClient(
                     url=url,
-                    client_id=_get_password(url, "Client_ID", modify=modify),
-                    secret_key=_get_password(url, "Secret_Key", modify=modify),
+                    client_id=credentials[(url, "Client_ID")],
+                    secret_key=credentials[(url, "Secret_Key")],
                 )
             )
         else:
             vectra_api_clients.append(
                 VectraClient(
                     url,
-                    _get_password(url, "Token", modify=modify),
+                    credentials[(url, "Token")],
                 )
             )
 